@@ -15,36 +15,69 @@
 
 require_once __DIR__ . '/includes/functions.php';
 
+// The fetch scripts are loaded in-process rather than run as separate PHP
+// processes; they must be required at file scope so their globals stay global
+require_once __DIR__ . '/fetch-changelog.php';
+require_once __DIR__ . '/fetch-posts.php';
+
 /**
- * Run a PHP script and return true if successful.
+ * List the files in the changelogs directory.
  *
- * @param string $script_name The script filename
- * @param array $args Arguments to pass
- * @return bool True if successful
+ * @return array Filenames as keys, empty if the directory is missing
  */
-function run_script($script_name, $args = []) {
-    $script_path = __DIR__ . '/' . $script_name;
+function list_changelog_files() {
+    $changelogs_dir = 'changelogs';
 
-    if (!file_exists($script_path)) {
-        echo "Error: Script not found: {$script_name}\n";
-        return false;
+    if (!is_dir($changelogs_dir)) {
+        return [];
     }
 
-    $command = 'php ' . escapeshellarg($script_path);
-    foreach ($args as $arg) {
-        $command .= ' ' . escapeshellarg($arg);
-    }
+    return array_flip(scandir($changelogs_dir));
+}
+
+/**
+ * Remove a single trailing ".0" from a version, e.g. "9.9.0" => "9.9".
+ *
+ * @param string $version The version
+ * @return string The version without its trailing ".0"
+ */
+function strip_trailing_zero($version) {
+    return substr($version, -2) === '.0' ? substr($version, 0, -2) : $version;
+}
+
+/**
+ * Check which changelog files exist for several versions at once.
+ *
+ * @param array $versions The versions to check
+ * @return array Map of version => path, or null if not found
+ */
+function check_changelog_exists_many($versions) {
+    $entries = list_changelog_files();
+    $paths = [];
+
+    foreach ($versions as $version) {
+        $paths[$version] = null;
 
-    $output = [];
-    $return_var = 0;
-    exec($command, $output, $return_var);
+        // Candidate filenames in priority order
+        $short_version = strip_trailing_zero($version);
+        $possible_names = [
+            "{$version}.csv",
+            "{$version}.0.csv",
+            "{$short_version}.csv",
+            "{$version}.txt",
+            "{$version}.0.txt",
+            "{$short_version}.txt",
+        ];
 
-    // Print output
-    foreach ($output as $line) {
-        echo $line . "\n";
+        foreach ($possible_names as $name) {
+            if (isset($entries[$name])) {
+                $paths[$version] = "changelogs/{$name}";
+                break;
+            }
+        }
     }
 
-    return $return_var === 0;
+    return $paths;
 }
 
 /**
@@ -54,22 +87,7 @@ function run_script($script_name, $args = []) {
  * @return string|null The path if found, null otherwise
  */
 function check_changelog_exists($version) {
-    $possible_paths = [
-        "changelogs/{$version}.csv",
-        "changelogs/{$version}.0.csv",
-        "changelogs/" . rtrim($version, '.0') . ".csv",
-        "changelogs/{$version}.txt",
-        "changelogs/{$version}.0.txt",
-        "changelogs/" . rtrim($version, '.0') . ".txt",
-    ];
-
-    foreach ($possible_paths as $path) {
-        if (file_exists($path)) {
-            return $path;
-        }
-    }
-
-    return null;
+    return check_changelog_exists_many([$version])[$version];
 }
 
 /**
@@ -84,8 +102,22 @@ function check_release_posts_exist() {
         return false;
     }
 
-    $files = glob("{$release_posts_dir}/*.txt");
-    return !empty($files);
+    $handle = opendir($release_posts_dir);
+    if (!$handle) {
+        return false;
+    }
+
+    // Stop at the first .txt file instead of listing the whole directory
+    $found = false;
+    while (($entry = readdir($handle)) !== false) {
+        if (substr($entry, -4) === '.txt' && is_file("{$release_posts_dir}/{$entry}")) {
+            $found = true;
+            break;
+        }
+    }
+    closedir($handle);
+
+    return $found;
 }
 
 /**
@@ -166,7 +198,7 @@ function main() {
     // Fetch release posts if requested
     if ($fetch_posts) {
         echo "Fetching release posts...\n";
-        if (!run_script('fetch-posts.php')) {
+        if (!fetch_and_save_posts()) {
             echo "Failed to fetch release posts\n";
             return;
         }
@@ -179,7 +211,7 @@ function main() {
             return;
         }
         echo "Fetching changelog for version {$version}...\n";
-        if (!run_script('fetch-changelog.php', [$version])) {
+        if (!fetch_prs_from_github($version)) {
             echo "Failed to fetch changelog\n";
             return;
         }
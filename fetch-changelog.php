@@ -18,25 +18,36 @@ $GITHUB_TOKEN = $env['GITHUB_TOKEN'] ?? '';
 $REPO_OWNER = 'woocommerce';
 $REPO_NAME = 'woocommerce';
 
+define('CHANGELOG_HEADERS', ['ID', 'Title', 'Author', 'Labels', 'URL', 'Description', 'Ranking']);
+
+// PRs with any of these labels aren't release-note material, so their
+// descriptions are not fetched
+define('SKIP_DESCRIPTION_LABELS', ['type: docs', 'type: chore', 'type: tests', 'type: dependencies']);
+
 /**
  * Fetch changelog from trunk changelog.txt
  *
+ * Not used by the CLI or audit-release-prs.php, which always build the
+ * changelog from the milestone's PRs with fetch_prs_from_github().
+ *
  * @param string $version The version to fetch
  * @return bool True on success, false on failure
  */
 function fetch_changelog($version) {
     $changelog_url = 'https://raw.githubusercontent.com/woocommerce/woocommerce/refs/heads/trunk/changelog.txt';
 
-    $ch = curl_init($changelog_url);
-    curl_setopt_array($ch, [
-        CURLOPT_RETURNTRANSFER => true,
-        CURLOPT_FOLLOWLOCATION => true,
-        CURLOPT_HTTPHEADER => ['User-Agent: WooDevTools']
-    ]);
-
-    $content = curl_exec($ch);
-    $http_code = curl_getinfo($ch, CURLINFO_HTTP_CODE);
-    curl_close($ch);
+    $result = curl_exec_with_retry(function() use ($changelog_url) {
+        $ch = curl_init($changelog_url);
+        curl_setopt_array($ch, [
+            CURLOPT_RETURNTRANSFER => true,
+            CURLOPT_FOLLOWLOCATION => true,
+            CURLOPT_SHARE => curl_shared_handle(),
+            CURLOPT_HTTPHEADER => ['User-Agent: WooDevTools']
+        ]);
+        return $ch;
+    });
+    $content = $result['body'];
+    $http_code = $result['http_code'];
 
     if ($http_code !== 200 || empty($content)) {
         echo "Error fetching changelog from trunk\n";
@@ -83,7 +94,7 @@ function fetch_prs_from_github($version) {
     // First verify the milestone exists
     $milestone_url = "https://api.github.com/repos/{$REPO_OWNER}/{$REPO_NAME}/milestones";
 
-    $response = github_request($milestone_url, $GITHUB_TOKEN, true);
+    $response = github_request_cached($milestone_url, $GITHUB_TOKEN);
     if ($response['http_code'] === 403) {
         echo "Error: GitHub API rate limit exceeded. Please try again later.\n";
         return false;
@@ -97,9 +108,11 @@ function fetch_prs_from_github($version) {
 
     // Find the milestone that matches our version
     $milestone_number = null;
+    $milestone_closed_issues = 0;
     foreach ($milestones as $milestone) {
         if ($milestone['title'] === $version) {
             $milestone_number = $milestone['number'];
+            $milestone_closed_issues = (int)($milestone['closed_issues'] ?? 0);
             echo "Found milestone {$version} with number {$milestone_number}\n";
             break;
         }
@@ -123,17 +136,30 @@ function fetch_prs_from_github($version) {
     ];
 
     $all_prs = [];
-    $next_url = $url . '?' . http_build_query($params);
     $page_count = 0;
 
-    while ($next_url) {
-        $page_count++;
-        echo "Fetching PRs from page {$page_count}...\n";
+    // The milestone reports how many closed items it holds, so all of the
+    // expected pages can be requested together rather than one at a time
+    $expected_pages = max(1, (int)ceil($milestone_closed_issues / $params['per_page']));
+    $requests = [];
+    for ($page = 1; $page <= $expected_pages; $page++) {
+        $requests[$page] = ['url' => $url . '?' . http_build_query($params + ['page' => $page])];
+    }
+
+    echo "Fetching {$expected_pages} page(s) of PRs...\n";
+    $responses = array_values(github_request_multi($requests, $GITHUB_TOKEN));
 
-        $response = github_request($next_url, $GITHUB_TOKEN, true);
+    while ($response = array_shift($responses)) {
+        $page_count++;
         $issues = json_decode($response['body'], true);
 
-        if (!is_array($issues) || empty($issues)) {
+        // A failed page would silently truncate the changelog, so give up
+        if ($response['http_code'] !== 200 || !is_array($issues)) {
+            echo "Error fetching PRs page {$page_count}: HTTP {$response['http_code']}\n";
+            return false;
+        }
+
+        if (empty($issues)) {
             echo "No more PRs found, stopping pagination.\n";
             break;
         }
@@ -143,15 +169,21 @@ function fetch_prs_from_github($version) {
             return isset($issue['pull_request']);
         });
 
-        echo "Found " . count($prs) . " PRs on this page\n";
+        echo "Found " . count($prs) . " PRs on page {$page_count}\n";
         $all_prs = array_merge($all_prs, $prs);
 
-        // Get the next page URL from the Link header
-        $next_url = parse_next_page_url($response['headers']['link'] ?? '');
+        // Follow the Link header past the last requested page in case the
+        // milestone has grown since its count was read
+        if (empty($responses)) {
+            $next_url = parse_next_page_url($response['headers']['link'] ?? '');
 
-        if (!$next_url) {
-            echo "No more pages available\n";
-            break;
+            if (!$next_url) {
+                echo "No more pages available\n";
+                break;
+            }
+
+            echo "Fetching PRs from page " . ($page_count + 1) . "...\n";
+            $responses[] = github_request($next_url, $GITHUB_TOKEN, true);
         }
     }
 
@@ -164,46 +196,90 @@ function fetch_prs_from_github($version) {
 
     // Format PRs into changelog format
     $changelog_rows = format_prs_as_changelog($all_prs);
-    save_changelog($version, $changelog_rows);
-    return true;
+    return save_pr_changelog($version, $changelog_rows);
 }
 
 /**
- * Fetch PR description from GitHub API.
+ * Fetch PR descriptions from GitHub API concurrently.
+ *
+ * PR bodies are cached under .cache/pr/ along with their ETag, so repeat
+ * runs only revalidate with If-None-Match and reuse the cached body on 304.
+ * Each description is passed to $on_description as soon as it arrives.
  *
- * @param int $pr_id The PR ID
- * @return string The extracted changes section
+ * @param array $pr_ids The PR IDs
+ * @param callable $on_description Called as $on_description($pr_id, $changes_section)
+ * @return void
  */
-function fetch_pr_description($pr_id) {
+function fetch_pr_descriptions($pr_ids, $on_description) {
     global $GITHUB_TOKEN, $REPO_OWNER, $REPO_NAME;
 
     if (empty($GITHUB_TOKEN)) {
         echo "Error: GITHUB_TOKEN environment variable is not set\n";
-        return '';
+        foreach ($pr_ids as $pr_id) {
+            $on_description($pr_id, '');
+        }
+        return;
     }
 
-    $url = "https://api.github.com/repos/{$REPO_OWNER}/{$REPO_NAME}/pulls/{$pr_id}";
-    $response = github_request($url, $GITHUB_TOKEN, true);
-
-    if ($response['http_code'] === 200) {
-        $pr_data = json_decode($response['body'], true);
-        return extract_changes_section($pr_data['body'] ?? '');
-    } elseif ($response['http_code'] === 403) {
-        // Rate limit handled inside github_request, but just in case
-        echo "Rate limit exceeded. Waiting 60 seconds...\n";
-        sleep(60);
-        return fetch_pr_description($pr_id);
-    } else {
-        echo "Error fetching PR {$pr_id}: HTTP {$response['http_code']}\n";
-        return '';
+    $requests = [];
+    foreach ($pr_ids as $pr_id) {
+        $cached = read_cache_file(CACHE_DIR . "/pr/{$pr_id}.json");
+
+        $extra_headers = [];
+        if (!empty($cached['etag'])) {
+            $extra_headers[] = "If-None-Match: {$cached['etag']}";
+        }
+
+        $requests[$pr_id] = [
+            'url' => "https://api.github.com/repos/{$REPO_OWNER}/{$REPO_NAME}/pulls/{$pr_id}",
+            'headers' => $extra_headers
+        ];
     }
+
+    echo "Fetching " . count($requests) . " PR descriptions...\n";
+    github_request_multi($requests, $GITHUB_TOKEN, 16, function($pr_id, $response) use ($on_description) {
+        $cache_path = CACHE_DIR . "/pr/{$pr_id}.json";
+        $cached = $response['http_code'] === 304 ? read_cache_file($cache_path) : null;
+
+        if ($cached !== null) {
+            $description = extract_changes_section($cached['body'] ?? '');
+        } elseif ($response['http_code'] === 200) {
+            $pr_data = json_decode($response['body'], true);
+            $body = $pr_data['body'] ?? '';
+
+            if (!empty($response['headers']['etag'])) {
+                // Merge into the entry shared with fetch-pr-descriptions.php,
+                // keeping its updatedAt validator in step with the body
+                $entry = read_cache_file($cache_path) ?? [];
+                if (($entry['body'] ?? null) !== $body) {
+                    unset($entry['updated_at']);
+                }
+                if (!empty($pr_data['updated_at'])) {
+                    $entry['updated_at'] = $pr_data['updated_at'];
+                }
+                $entry['etag'] = $response['headers']['etag'];
+                $entry['body'] = $body;
+                write_cache_file($cache_path, $entry);
+            }
+
+            $description = extract_changes_section($body);
+        } else {
+            echo "Error fetching PR {$pr_id}: HTTP {$response['http_code']}\n";
+            $description = '';
+        }
+
+        $on_description($pr_id, $description);
+    });
 }
 
 /**
  * Format PRs into a list of associative arrays for CSV output.
  *
+ * Descriptions are left as null here for save_pr_changelog() to fill in,
+ * or set to an empty string for PRs with a label in SKIP_DESCRIPTION_LABELS.
+ *
  * @param array $prs The PRs to format
- * @return array The formatted changelog rows
+ * @return array The formatted changelog rows, keyed by PR ID
  */
 function format_prs_as_changelog($prs) {
     $changelog_rows = [];
@@ -223,16 +299,18 @@ function format_prs_as_changelog($prs) {
         }, $labels);
         $label_str = implode(', ', $label_names);
 
-        // Fetch PR description
-        $description = fetch_pr_description($pr_id);
+        $skip_description = !empty(array_intersect(
+            array_map('strtolower', $label_names),
+            SKIP_DESCRIPTION_LABELS
+        ));
 
-        $changelog_rows[] = [
+        $changelog_rows[$pr_id] = [
             'ID' => $pr_id,
             'Title' => $title,
             'Author' => $author,
             'Labels' => $label_str,
             'URL' => $url,
-            'Description' => $description,
+            'Description' => $skip_description ? '' : null,
             'Ranking' => '' // Blank for now
         ];
     }
@@ -240,6 +318,68 @@ function format_prs_as_changelog($prs) {
     return $changelog_rows;
 }
 
+/**
+ * Fetch PR descriptions and write the changelog rows to a CSV file.
+ *
+ * Each row is written as soon as its description, and those of all rows
+ * before it, have arrived. Only out-of-order descriptions are held in
+ * memory, and an interrupted run still leaves a valid partial CSV.
+ *
+ * @param string $version The version
+ * @param array $rows The changelog rows, keyed by PR ID
+ * @return bool True on success, false on failure
+ */
+function save_pr_changelog($version, $rows) {
+    ensure_directory('changelogs');
+    $filename = "changelogs/{$version}.csv";
+
+    $handle = open_csv_with_bom($filename, CHANGELOG_HEADERS);
+    if (!$handle) {
+        echo "Error saving changelog\n";
+        return false;
+    }
+
+    $order = array_keys($rows);
+    $next = 0;
+    $descriptions = [];
+    $fetch_ids = [];
+
+    foreach ($rows as $pr_id => $row) {
+        if ($row['Description'] === null) {
+            $fetch_ids[] = $pr_id;
+        } else {
+            $descriptions[$pr_id] = $row['Description'];
+        }
+    }
+
+    // Write rows in changelog order once all earlier rows are ready
+    $write_ready_rows = function() use ($handle, $order, &$rows, &$next, &$descriptions) {
+        while ($next < count($order) && isset($descriptions[$order[$next]])) {
+            $row_id = $order[$next];
+            $rows[$row_id]['Description'] = $descriptions[$row_id];
+            write_csv_row($handle, CHANGELOG_HEADERS, $rows[$row_id]);
+            unset($rows[$row_id], $descriptions[$row_id]);
+            $next++;
+        }
+
+        fflush($handle);
+    };
+
+    $write_ready_rows();
+
+    if (!empty($fetch_ids)) {
+        fetch_pr_descriptions($fetch_ids, function($pr_id, $description) use (&$descriptions, $write_ready_rows) {
+            $descriptions[$pr_id] = $description;
+            $write_ready_rows();
+        });
+    }
+
+    fclose($handle);
+
+    echo "Successfully saved changelog to {$filename}\n";
+    return true;
+}
+
 /**
  * Save the changelog content to a CSV file.
  *
@@ -266,9 +406,7 @@ function save_changelog($version, $content) {
         $rows = $content; // content is already a list of dicts from PRs
     }
 
-    $headers = ['ID', 'Title', 'Author', 'Labels', 'URL', 'Description', 'Ranking'];
-
-    if (write_csv_with_bom($filename, $headers, $rows)) {
+    if (write_csv_with_bom($filename, CHANGELOG_HEADERS, $rows)) {
         echo "Successfully saved changelog to {$filename}\n";
         return true;
     } else {
@@ -277,8 +415,8 @@ function save_changelog($version, $content) {
     }
 }
 
-// Main execution
-if (php_sapi_name() === 'cli') {
+// Main execution (skipped when included by audit-release-prs.php)
+if (php_sapi_name() === 'cli' && get_included_files()[0] === __FILE__) {
     // Get version from argument or prompt
     $version = $argv[1] ?? null;
 
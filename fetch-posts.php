@@ -28,19 +28,22 @@ function get_date_from_post($post) {
 /**
  * Fetch and save release posts from WordPress.
  *
- * @return void
+ * @return bool True on success, false on failure
  */
 function fetch_and_save_posts() {
     $base_url = WP_SITE_URL . '/wp-json/wp/v2';
 
     // First, get the category ID for 'Release Posts'
     $categories_url = "{$base_url}/categories";
-    $categories_response = wordpress_request($categories_url, ['per_page' => 100]);
-    $categories = json_decode($categories_response, true);
+    $categories_response = wordpress_request_cached($categories_url, [
+        'per_page' => 100,
+        '_fields' => 'id,name'
+    ]);
+    $categories = json_decode($categories_response['body'], true);
 
     if (!is_array($categories)) {
         echo "Error fetching categories\n";
-        return;
+        return false;
     }
 
     // Find the Release Posts category
@@ -54,7 +57,7 @@ function fetch_and_save_posts() {
 
     if (!$release_posts_category) {
         echo "Could not find 'Release Posts' category\n";
-        return;
+        return false;
     }
 
     // Get posts from the Release Posts category
@@ -63,38 +66,44 @@ function fetch_and_save_posts() {
         'categories' => $release_posts_category['id'],
         'per_page' => 100,
         'orderby' => 'date',
-        'order' => 'desc'
+        'order' => 'desc',
+        // Content is fetched separately, and only for posts not yet saved;
+        // the full post objects also carry large SEO and embed payloads
+        '_fields' => 'id,date,link,title'
     ];
 
-    $posts_response = wordpress_request($posts_url, $params);
-    $posts = json_decode($posts_response, true);
+    $posts_response = wordpress_request_cached($posts_url, $params);
+    $posts = json_decode($posts_response['body'], true);
 
     if (!is_array($posts)) {
         echo "Error fetching posts\n";
-        return;
+        return false;
     }
 
     // Create release-posts directory if it doesn't exist
     ensure_directory(RELEASE_POSTS_DIR);
 
-    // Get list of existing files to avoid duplicates
+    // Get list of existing files to avoid duplicates, keyed for fast lookup
     $existing_files = [];
     if (is_dir(RELEASE_POSTS_DIR)) {
-        $existing_files = scandir(RELEASE_POSTS_DIR);
+        $existing_files = array_flip(scandir(RELEASE_POSTS_DIR));
     }
 
-    // Process each post
+    // Posts with these terms in their (already lowercase) slug are skipped
+    $skip_terms = ['woocommerce-blocks', 'delayed', 'dot-release'];
+
+    // Work out which posts still need saving before downloading any content
+    $new_posts = [];
     foreach ($posts as $post) {
         // Get the date and title
         $post_date = get_date_from_post($post);
         $title = html_entity_decode($post['title']['rendered'], ENT_QUOTES | ENT_HTML5, 'UTF-8');
 
         // Skip posts with specific terms in the title
-        $skip_terms = ['woocommerce-blocks', 'delayed', 'dot-release'];
         $sanitized_title = sanitize_filename($title);
         $should_skip = false;
         foreach ($skip_terms as $term) {
-            if (stripos($sanitized_title, strtolower($term)) !== false) {
+            if (strpos($sanitized_title, $term) !== false) {
                 $should_skip = true;
                 break;
             }
@@ -109,11 +118,52 @@ function fetch_and_save_posts() {
         $filename = "{$post_date}-{$sanitized_title}.txt";
 
         // Skip if we've already processed this post
-        if (in_array($filename, $existing_files)) {
+        if (isset($existing_files[$filename])) {
             echo "Skipping already processed post: {$title}\n";
             continue;
         }
 
+        $new_posts[$post['id']] = [
+            'post' => $post,
+            'title' => $title,
+            'filename' => $filename
+        ];
+    }
+
+    if (empty($new_posts)) {
+        echo "No new release posts to save\n";
+        return true;
+    }
+
+    // Fetch the content of every new post in a single request. Each set of
+    // IDs is only asked for once, so this isn't worth caching.
+    $contents_response = wordpress_request($posts_url, [
+        'include' => implode(',', array_keys($new_posts)),
+        'per_page' => count($new_posts),
+        '_fields' => 'id,content'
+    ], true);
+    $contents = json_decode($contents_response['body'], true);
+
+    if (!is_array($contents)) {
+        echo "Error fetching post content\n";
+        return false;
+    }
+
+    $rendered_content = [];
+    foreach ($contents as $item) {
+        $rendered_content[$item['id']] = $item['content']['rendered'];
+    }
+
+    // Process each new post
+    foreach ($new_posts as $post_id => $new_post) {
+        $post = $new_post['post'];
+        $title = $new_post['title'];
+
+        if (!isset($rendered_content[$post_id])) {
+            echo "Error fetching content for post: {$title}\n";
+            continue;
+        }
+
         // Prepare the content
         $content = "Title: {$title}\n";
         $content .= "Date: {$post['date']}\n";
@@ -121,20 +171,23 @@ function fetch_and_save_posts() {
         $content .= "\nContent:\n";
 
         // Convert HTML to text (similar to html2text)
-        $markdown_content = html_to_text($post['content']['rendered']);
+        $markdown_content = html_to_text($rendered_content[$post_id]);
         $content .= $markdown_content;
 
         // Save to file
-        $filepath = RELEASE_POSTS_DIR . '/' . $filename;
+        $filepath = RELEASE_POSTS_DIR . '/' . $new_post['filename'];
         if (file_put_contents($filepath, $content) !== false) {
             echo "Saved post: {$title}\n";
         } else {
             echo "Error saving post: {$title}\n";
         }
     }
+
+    return true;
 }
 
-// Main execution
-if (php_sapi_name() === 'cli') {
-    fetch_and_save_posts();
+// Main execution (skipped when included by audit-release-prs.php)
+if (php_sapi_name() === 'cli' && get_included_files()[0] === __FILE__) {
+    $success = fetch_and_save_posts();
+    exit($success ? 0 : 1);
 }
@@ -18,67 +18,216 @@ $GITHUB_TOKEN = $env['GITHUB_TOKEN'] ?? '';
 $REPO_OWNER = 'woocommerce';
 $REPO_NAME = 'woocommerce';
 
+// Maximum number of PRs requested in a single GraphQL query
+define('GRAPHQL_BATCH_SIZE', 100);
+
+// A PR link in the changelog, capturing the PR number
+define('PR_REFERENCE_PATTERN', '/\/pull\/(\d+)/');
+
+// Start of the "Changes proposed" paragraph, also written after each PR line
+define('CHANGES_PROPOSED_PREFIX', 'Changes proposed in this Pull Request:');
+
+// The "Changes proposed" paragraph of a PR description
+define('PR_CHANGES_PARAGRAPH_PATTERN', '/Changes proposed in this Pull Request:.*?(?=\n\n|\Z)/s');
+
 /**
- * Read the changelog file content.
+ * Open the changelog file for reading.
  *
  * @param string $file_path The path to the changelog file
- * @return string The file content
+ * @return resource The file handle
  */
-function read_changelog($file_path) {
+function open_changelog($file_path) {
     if (!file_exists($file_path)) {
         throw new Exception("File not found: {$file_path}");
     }
-    return file_get_contents($file_path);
+
+    $handle = fopen($file_path, 'r');
+    if (!$handle) {
+        throw new Exception("Unable to open file: {$file_path}");
+    }
+
+    return $handle;
 }
 
 /**
- * Find all PR references in the content.
+ * Check whether a line already starts a "Changes proposed" paragraph.
  *
- * @param string $content The changelog content
- * @return array Array of [line, pr_id] tuples
+ * @param string|false $line The line, or false at the end of the file
+ * @return bool True if the line starts with the changes section heading
  */
-function find_pr_references($content) {
-    $pr_pattern = '/\/pull\/(\d+)/';
-    $lines = explode("\n", $content);
+function is_changes_line($line) {
+    return $line !== false && strpos($line, CHANGES_PROPOSED_PREFIX) === 0;
+}
+
+/**
+ * Check whether a line ends a "Changes proposed" block written by this script.
+ *
+ * Blocks are always followed by an empty "\n" line. Empty lines inside a
+ * block can only come from a CRLF PR body, so they end in "\r\n" instead.
+ *
+ * @param string $line The line
+ * @return bool True if the line closes the block
+ */
+function is_changes_block_end($line) {
+    return $line === "\n";
+}
+
+/**
+ * Find the PR references in the changelog that still need a description.
+ *
+ * Reads the file a line at a time rather than loading it whole. Lines that
+ * are already followed by a "Changes proposed" block, e.g. from an earlier
+ * run, are skipped, as are any PR links inside those blocks.
+ *
+ * @param string $file_path The path to the changelog file
+ * @return array The referenced PR ID for each line that needs one
+ */
+function find_pr_references($file_path) {
+    $handle = open_changelog($file_path);
     $pr_references = [];
+    $previous_pr_id = null;
+    $in_changes_block = false;
 
-    foreach ($lines as $line) {
-        if (preg_match($pr_pattern, $line, $matches)) {
-            $pr_id = $matches[1];
-            $pr_references[] = [$line, $pr_id];
+    while (($line = fgets($handle)) !== false) {
+        // Skip over an existing block up to its closing blank line
+        if ($in_changes_block) {
+            $in_changes_block = !is_changes_block_end($line);
+            continue;
         }
+
+        if ($previous_pr_id !== null && is_changes_line($line)) {
+            $in_changes_block = true;
+            $previous_pr_id = null;
+            continue;
+        }
+
+        if ($previous_pr_id !== null) {
+            $pr_references[] = $previous_pr_id;
+        }
+
+        $previous_pr_id = preg_match(PR_REFERENCE_PATTERN, $line, $matches) ? $matches[1] : null;
+    }
+
+    if ($previous_pr_id !== null) {
+        $pr_references[] = $previous_pr_id;
     }
 
+    fclose($handle);
+
     return $pr_references;
 }
 
 /**
- * Fetch PR description from GitHub API.
+ * Query pull requests from the GitHub GraphQL API.
  *
- * @param string $pr_id The PR ID
- * @return string The full PR body
+ * Each query asks for up to GRAPHQL_BATCH_SIZE pull requests at once
+ * using aliases, so a whole changelog usually takes a single request.
+ *
+ * @param array $fields Map of PR ID => GraphQL fields to select for that PR
+ * @return array Map of PR ID => pull request data, or null if unavailable
  */
-function fetch_pr_description_body($pr_id) {
+function query_pull_requests($fields) {
     global $GITHUB_TOKEN, $REPO_OWNER, $REPO_NAME;
 
+    $results = [];
+
+    foreach (array_chunk($fields, GRAPHQL_BATCH_SIZE, true) as $batch) {
+        // One aliased field per PR, e.g. pr123: pullRequest(number: 123) { body }
+        $selection = '';
+        foreach ($batch as $pr_id => $pr_fields) {
+            $pr_id = (int)$pr_id;
+            $selection .= "pr{$pr_id}: pullRequest(number: {$pr_id}) { {$pr_fields} }\n";
+        }
+        $query = "query {\nrepository(owner: \"{$REPO_OWNER}\", name: \"{$REPO_NAME}\") {\n{$selection}}\n}";
+
+        echo "Querying " . count($batch) . " PRs...\n";
+        $data = github_graphql_request($query, $GITHUB_TOKEN);
+
+        foreach (array_keys($batch) as $pr_id) {
+            $results[$pr_id] = $data['repository']["pr{$pr_id}"] ?? null;
+        }
+    }
+
+    return $results;
+}
+
+/**
+ * Save a PR body to the shared PR cache.
+ *
+ * Both scripts merge into the same .cache/pr/<id>.json entry: this one
+ * keeps the ETag stored by fetch-changelog.php (a stale ETag only costs a
+ * full response on its next use), and fetch-changelog.php keeps or
+ * refreshes the updated_at written here.
+ *
+ * @param string $pr_id The PR ID
+ * @param array $pr Pull request data with 'body' and 'updatedAt'
+ * @return void
+ */
+function cache_pr_body($pr_id, $pr) {
+    $cache_path = CACHE_DIR . "/pr/{$pr_id}.json";
+    $entry = read_cache_file($cache_path) ?? [];
+    $entry['body'] = $pr['body'] ?? '';
+    $entry['updated_at'] = $pr['updatedAt'];
+    write_cache_file($cache_path, $entry);
+}
+
+/**
+ * Fetch PR descriptions, reusing cached bodies for unchanged PRs.
+ *
+ * GraphQL has no conditional requests, so bodies are cached under
+ * .cache/pr/ with the PR's updatedAt timestamp instead of an ETag. Cached
+ * PRs are only asked for updatedAt, and their body is fetched again only
+ * when it has moved on.
+ *
+ * @param array $pr_ids The PR IDs
+ * @return array Map of PR ID to full PR body
+ */
+function fetch_pr_description_bodies($pr_ids) {
+    global $GITHUB_TOKEN;
+
     if (empty($GITHUB_TOKEN)) {
         throw new Exception("GITHUB_TOKEN environment variable is not set");
     }
 
-    $url = "https://api.github.com/repos/{$REPO_OWNER}/{$REPO_NAME}/pulls/{$pr_id}";
-    $response = github_request($url, $GITHUB_TOKEN, true);
-
-    if ($response['http_code'] === 200) {
-        $pr_data = json_decode($response['body'], true);
-        return $pr_data['body'] ?? '';
-    } elseif ($response['http_code'] === 403) {
-        echo "Rate limit exceeded. Waiting 60 seconds...\n";
-        sleep(60);
-        return fetch_pr_description_body($pr_id);
-    } else {
-        echo "Error fetching PR {$pr_id}: HTTP {$response['http_code']}\n";
-        return '';
+    $cached = [];
+    $fields = [];
+    foreach ($pr_ids as $pr_id) {
+        $entry = read_cache_file(CACHE_DIR . "/pr/{$pr_id}.json");
+        if (isset($entry['updated_at'], $entry['body'])) {
+            $cached[$pr_id] = $entry;
+            $fields[$pr_id] = 'updatedAt';
+        } else {
+            $fields[$pr_id] = 'body updatedAt';
+        }
+    }
+
+    $bodies = [];
+    $changed = [];
+
+    foreach (query_pull_requests($fields) as $pr_id => $pr) {
+        if ($pr === null) {
+            $bodies[$pr_id] = $cached[$pr_id]['body'] ?? '';
+        } elseif (array_key_exists('body', $pr)) {
+            cache_pr_body($pr_id, $pr);
+            $bodies[$pr_id] = $pr['body'] ?? '';
+        } elseif ($pr['updatedAt'] === $cached[$pr_id]['updated_at']) {
+            $bodies[$pr_id] = $cached[$pr_id]['body'];
+        } else {
+            $changed[$pr_id] = 'body updatedAt';
+        }
     }
+
+    // Fetch bodies for cached PRs that have changed since they were cached
+    foreach (query_pull_requests($changed) as $pr_id => $pr) {
+        if ($pr === null) {
+            $bodies[$pr_id] = $cached[$pr_id]['body'];
+        } else {
+            cache_pr_body($pr_id, $pr);
+            $bodies[$pr_id] = $pr['body'] ?? '';
+        }
+    }
+
+    return $bodies;
 }
 
 /**
@@ -88,40 +237,105 @@ function fetch_pr_description_body($pr_id) {
  * @return string The extracted changes section
  */
 function extract_pr_changes_section($description) {
-    $pattern = '/Changes proposed in this Pull Request:.*?(?=\n\n|\Z)/s';
-    if (preg_match($pattern, $description, $matches)) {
+    if (preg_match(PR_CHANGES_PARAGRAPH_PATTERN, $description, $matches)) {
         return trim($matches[0]);
     }
     return '';
 }
 
 /**
- * Update the changelog content with PR descriptions.
+ * Fetch the "Changes proposed" section of each referenced PR.
  *
- * @param string $content The original changelog content
- * @param array $pr_references Array of [line, pr_id] tuples
- * @return string The updated changelog content
+ * A PR referenced on several lines is only fetched and extracted once.
+ *
+ * @param array $pr_references The referenced PR IDs, possibly repeated
+ * @return array Map of PR ID to its changes section
  */
-function update_changelog($content, $pr_references) {
-    $lines = explode("\n", $content);
-    $updated_lines = [];
-
-    foreach ($lines as $line) {
-        $updated_lines[] = $line;
-
-        foreach ($pr_references as list($ref_line, $pr_id)) {
-            if ($line === $ref_line) {
-                $description = fetch_pr_description_body($pr_id);
-                $changes = extract_pr_changes_section($description);
-                if (!empty($changes)) {
-                    $updated_lines[] = $changes;
-                    $updated_lines[] = ''; // Add blank line for readability
+function fetch_pr_changes($pr_references) {
+    $pr_ids = array_keys(array_flip($pr_references));
+    $bodies = fetch_pr_description_bodies($pr_ids);
+
+    return array_map('extract_pr_changes_section', $bodies);
+}
+
+/**
+ * Update the changelog file with PR descriptions.
+ *
+ * The changelog is streamed a line at a time into a temporary file, which
+ * then replaces the original, so the file is never held in memory whole.
+ *
+ * @param string $file_path The path to the changelog file
+ * @param array $changes_by_pr Map of PR ID to its changes section
+ * @return void
+ */
+function update_changelog($file_path, $changes_by_pr) {
+    $input = open_changelog($file_path);
+    $tmp_path = $file_path . '.tmp';
+    $output = fopen($tmp_path, 'w');
+    if (!$output) {
+        fclose($input);
+        throw new Exception("Unable to write file: {$tmp_path}");
+    }
+
+    $write = function($data) use ($output, $tmp_path) {
+        if (fwrite($output, $data) !== strlen($data)) {
+            throw new Exception("Unable to write file: {$tmp_path}");
+        }
+    };
+
+    try {
+        $in_changes_block = false;
+
+        $line = fgets($input);
+        while ($line !== false) {
+            $write($line);
+
+            // Look one line ahead so already-described references are left alone
+            $next_line = fgets($input);
+
+            if ($in_changes_block) {
+                // Copy an existing block through to its closing blank line
+                $in_changes_block = !is_changes_block_end($line);
+            } elseif (preg_match(PR_REFERENCE_PATTERN, $line, $matches)) {
+                if (is_changes_line($next_line)) {
+                    $in_changes_block = true;
+                } elseif (!empty($changes_by_pr[$matches[1]])) {
+                    if (substr($line, -1) !== "\n") {
+                        $write("\n");
+                    }
+                    // Add blank line for readability
+                    $write($changes_by_pr[$matches[1]] . "\n\n");
                 }
             }
+
+            $line = $next_line;
         }
-    }
 
-    return implode("\n", $updated_lines);
+        fclose($input);
+        $input = null;
+
+        if (!fclose($output)) {
+            throw new Exception("Unable to write file: {$tmp_path}");
+        }
+        $output = null;
+
+        // Replace the original in one step
+        if (!rename($tmp_path, $file_path)) {
+            throw new Exception("Unable to replace file: {$file_path}");
+        }
+    } catch (Exception $e) {
+        // Don't leave a partial temp file next to the changelog
+        if ($input) {
+            fclose($input);
+        }
+        if ($output) {
+            fclose($output);
+        }
+        if (file_exists($tmp_path)) {
+            unlink($tmp_path);
+        }
+        throw $e;
+    }
 }
 
 // Main execution
@@ -135,22 +349,17 @@ if (php_sapi_name() === 'cli') {
     $changelog_file = $argv[1];
 
     try {
-        // Read the changelog
-        $content = read_changelog($changelog_file);
-
         // Find PR references
-        $pr_references = find_pr_references($content);
+        $pr_references = find_pr_references($changelog_file);
 
         if (empty($pr_references)) {
-            echo "No PR references found in {$changelog_file}\n";
+            echo "No PR references without descriptions found in {$changelog_file}\n";
             exit(0);
         }
 
-        // Update the changelog with PR descriptions
-        $updated_content = update_changelog($content, $pr_references);
-
-        // Write the updated content back to the file
-        file_put_contents($changelog_file, $updated_content);
+        // Fetch each unique PR once, then update the changelog
+        $changes_by_pr = fetch_pr_changes($pr_references);
+        update_changelog($changelog_file, $changes_by_pr);
 
         echo "Updated " . count($pr_references) . " PR references in {$changelog_file}\n";
 
@@ -14,25 +14,28 @@ require_once __DIR__ . '/includes/functions.php';
 define('WP_SITE_URL', 'https://developer.woocommerce.com');
 
 /**
- * Fetch posts from WordPress REST API with pagination info.
+ * Build the query parameters for a page of posts from the last year.
  *
  * @param int $per_page Posts per page
  * @param int $page Page number
- * @return array ['posts' => array, 'total_pages' => int]
+ * @return array The query parameters
  */
-function fetch_posts($per_page = 10, $page = 1) {
-    $endpoint = WP_SITE_URL . '/wp-json/wp/v2/posts';
-    $after_date = (new DateTime())->modify('-365 days')->format('c');
-
-    $params = [
+function posts_query_params($per_page, $page) {
+    return [
         'per_page' => $per_page,
         'page' => $page,
-        'after' => $after_date,
+        'after' => (new DateTime())->modify('-365 days')->format('c'),
         '_fields' => 'title,date,categories'
     ];
+}
 
-    $response = wordpress_request($endpoint, $params, true);
-
+/**
+ * Parse a posts response into posts and pagination info.
+ *
+ * @param array $response Response with 'body', 'headers' and 'http_code'
+ * @return array ['posts' => array, 'total_pages' => int]
+ */
+function parse_posts_response($response) {
     if ($response['http_code'] !== 200) {
         echo "Error fetching posts: HTTP {$response['http_code']}\n";
         return ['posts' => [], 'total_pages' => 0];
@@ -47,9 +50,82 @@ function fetch_posts($per_page = 10, $page = 1) {
     ];
 }
 
+/**
+ * Fetch posts from WordPress REST API with pagination info.
+ *
+ * If the site rejects the page size with HTTP 400, the request is retried
+ * with half as many posts per page until it is accepted.
+ *
+ * @param int $per_page Posts per page
+ * @param int $page Page number
+ * @return array ['posts' => array, 'total_pages' => int, 'per_page' => int]
+ */
+function fetch_posts($per_page = 100, $page = 1) {
+    $endpoint = WP_SITE_URL . '/wp-json/wp/v2/posts';
+    $response = wordpress_request($endpoint, posts_query_params($per_page, $page), true);
+
+    // Fall back to a smaller page size if the site enforces a lower ceiling
+    while ($response['http_code'] === 400 && $per_page > 1) {
+        $per_page = intdiv($per_page, 2);
+        echo "Page size rejected, retrying with {$per_page} posts per page...\n";
+        $response = wordpress_request($endpoint, posts_query_params($per_page, $page), true);
+    }
+
+    return parse_posts_response($response) + ['per_page' => $per_page];
+}
+
+/**
+ * Fetch several pages of posts concurrently.
+ *
+ * @param int $per_page Posts per page
+ * @param array $pages Page numbers to fetch
+ * @return array Posts from all pages, in page order
+ */
+function fetch_post_pages($per_page, $pages) {
+    $endpoint = WP_SITE_URL . '/wp-json/wp/v2/posts';
+
+    $requests = [];
+    foreach ($pages as $page) {
+        $requests[$page] = [
+            'url' => $endpoint,
+            'params' => posts_query_params($per_page, $page)
+        ];
+    }
+
+    $posts = [];
+    foreach (wordpress_request_multi($requests) as $response) {
+        $posts = array_merge($posts, parse_posts_response($response)['posts']);
+    }
+
+    return $posts;
+}
+
+/**
+ * Get the sortable key and display label for a post's month.
+ *
+ * Post dates come back as "2025-06-02T10:00:00", so the month is the first
+ * seven characters; each month's label is only formatted once.
+ *
+ * @param string $date The post date
+ * @return array [sort key such as "2025-06", label such as "June 2025"]
+ */
+function month_label($date) {
+    static $labels = [];
+
+    $month_key = substr($date, 0, 7);
+    if (!isset($labels[$month_key])) {
+        $labels[$month_key] = DateTime::createFromFormat('!Y-m', $month_key)->format('F Y');
+    }
+
+    return [$month_key, $labels[$month_key]];
+}
+
 /**
  * Fetch category names for given category IDs.
  *
+ * The API returns at most 100 categories per request, so IDs are requested
+ * in chunks of 100 and the chunks are fetched concurrently.
+ *
  * @param array $category_ids Array of category IDs
  * @return array Map of category ID to category name
  */
@@ -59,21 +135,31 @@ function get_category_names($category_ids) {
     }
 
     $endpoint = WP_SITE_URL . '/wp-json/wp/v2/categories';
-    $params = [
-        'include' => implode(',', $category_ids)
-    ];
-
-    $response = wordpress_request($endpoint, $params);
-    $categories = json_decode($response, true);
 
-    if (!is_array($categories)) {
-        echo "Error fetching categories\n";
-        return [];
+    $requests = [];
+    foreach (array_chunk($category_ids, 100) as $chunk) {
+        $requests[] = [
+            'url' => $endpoint,
+            'params' => [
+                'include' => implode(',', $chunk),
+                'per_page' => count($chunk),
+                '_fields' => 'id,name'
+            ]
+        ];
     }
 
     $category_map = [];
-    foreach ($categories as $cat) {
-        $category_map[$cat['id']] = $cat['name'];
+    foreach (wordpress_request_multi($requests) as $response) {
+        $categories = json_decode($response['body'], true);
+
+        if (!is_array($categories)) {
+            echo "Error fetching categories\n";
+            continue;
+        }
+
+        foreach ($categories as $cat) {
+            $category_map[$cat['id']] = $cat['name'];
+        }
     }
 
     return $category_map;
@@ -86,7 +172,11 @@ function get_category_names($category_ids) {
  * @return string The cleaned text
  */
 function clean_text($text) {
-    return html_entity_decode($text, ENT_QUOTES | ENT_HTML5, 'UTF-8');
+    // Drop any inline markup (e.g. <em>) before decoding entities, so
+    // encoded angle brackets in the title survive as text
+    $text = html_entity_decode(strip_tags($text), ENT_QUOTES | ENT_HTML5, 'UTF-8');
+    // Collapse runs of whitespace
+    return trim(preg_replace('/\s+/u', ' ', $text));
 }
 
 /**
@@ -105,15 +195,15 @@ function main() {
     echo "Fetching posts...\n";
 
     // Get first page and total pages
-    $result = fetch_posts(10, $page);
+    $result = fetch_posts(100, $page);
     $all_posts = array_merge($all_posts, $result['posts']);
     $total_pages = $result['total_pages'];
+    $per_page = $result['per_page'];
 
-    // Fetch remaining pages
-    for ($page = 2; $page <= $total_pages; $page++) {
-        echo "Fetching page {$page} of {$total_pages}...\n";
-        $result = fetch_posts(10, $page);
-        $all_posts = array_merge($all_posts, $result['posts']);
+    // Fetch remaining pages concurrently now that the total is known
+    if ($total_pages > 1) {
+        echo "Fetching pages 2-{$total_pages}...\n";
+        $all_posts = array_merge($all_posts, fetch_post_pages($per_page, range(2, $total_pages)));
     }
 
     echo "Found " . count($all_posts) . " posts\n";
@@ -140,11 +230,13 @@ function main() {
     // Structure: $posts_by_category[$cat_name][$month_year][] = $title
     $posts_by_category = [];
 
+    // Month labels mapped to their sortable keys
+    $month_keys = [];
+
     // Process posts
     echo "Processing posts...\n";
     foreach ($all_posts as $post) {
-        $post_date = new DateTime($post['date']);
-        $month_year = $post_date->format('F Y');
+        list($month_key, $month_year) = month_label($post['date']);
 
         // Add post to each of its categories
         foreach ($post['categories'] as $cat_id) {
@@ -161,24 +253,16 @@ function main() {
             // Clean the post title before adding it
             $clean_title = clean_text($post['title']['rendered']);
             $posts_by_category[$cat_name][$month_year][] = $clean_title;
+            $month_keys[$month_year] = $month_key;
         }
     }
 
-    // Get sorted list of unique month/years
-    $all_months = [];
-    foreach ($posts_by_category as $cat_posts) {
-        foreach (array_keys($cat_posts) as $month) {
-            $all_months[$month] = true;
-        }
-    }
-    $all_months = array_keys($all_months);
+    // Only the grouped titles are needed from here on
+    unset($all_posts);
 
-    // Sort by date
-    usort($all_months, function($a, $b) {
-        $date_a = DateTime::createFromFormat('F Y', $a);
-        $date_b = DateTime::createFromFormat('F Y', $b);
-        return $date_a <=> $date_b;
-    });
+    // Get unique month/years sorted by date; "Y-m" keys sort as strings
+    asort($month_keys);
+    $all_months = array_keys($month_keys);
 
     // Get sorted list of categories
     $categories = array_keys($posts_by_category);
@@ -188,20 +272,14 @@ function main() {
     echo "Creating CSV file...\n";
     $output_file = "{$export_dir}/wordpress_posts_by_category.csv";
 
-    $handle = fopen($output_file, 'w');
+    // Write header row (first column for month, then category names)
+    $handle = open_csv_with_bom($output_file, array_merge(['Month'], $categories));
     if (!$handle) {
         echo "Error opening file for writing\n";
         return;
     }
 
-    // Write UTF-8 BOM for Excel compatibility
-    fwrite($handle, "\xEF\xBB\xBF");
-
-    // Write header row (empty first column for month, then category names)
-    $headers = array_merge(['Month'], $categories);
-    fputcsv($handle, $headers, ',', '"', '\\');
-
-    // Write data rows (months as rows, categories as columns)
+    // Stream data rows (months as rows, categories as columns)
     foreach ($all_months as $month) {
         $row = [$month];
         foreach ($categories as $category) {
@@ -3,6 +3,31 @@
  * Shared utility functions for WooCommerce Dev Blog Tools
  */
 
+define('CACHE_DIR', dirname(__DIR__) . '/.cache');
+define('HTTP_MAX_RETRIES', 5);
+define('HTTP_RETRY_STATUS_CODES', [0, 502, 503, 504]);
+
+// How many times a rate-limited GitHub request is retried after waiting
+define('GITHUB_RATE_LIMIT_RETRIES', 5);
+
+// Content between "Changes proposed" and "How to test" in a PR description
+define('CHANGES_SECTION_PATTERN', '/Changes proposed in this Pull Request:(.*?)(?=How to test the changes in this Pull Request:|\Z)/s');
+
+// HTML to text substitutions applied by html_to_text(), in order
+define('HTML_TO_TEXT_REPLACEMENTS', [
+    // Convert headers to text with newlines
+    '/<h[1-6][^>]*>(.*?)<\/h[1-6]>/is' => "\n## $1\n\n",
+    // Convert paragraphs to double newlines
+    '/<\/p>/i' => "\n\n",
+    // Convert line breaks to newlines
+    '/<br\s*\/?>/i' => "\n",
+    // Convert list items
+    '/<li[^>]*>/i' => "* ",
+    '/<\/li>/i' => "\n",
+    // Convert links to markdown-style
+    '/<a[^>]+href=["\']([^"\']+)["\'][^>]*>(.*?)<\/a>/is' => '[$2]($1)',
+]);
+
 /**
  * Parse a .env file and return an associative array of environment variables.
  *
@@ -40,26 +65,212 @@ function parse_env_file($path) {
     return $env;
 }
 
+/**
+ * Get the cURL share handle used by every request.
+ *
+ * Sharing the connection cache, DNS cache and TLS sessions lets
+ * consecutive requests to the same host reuse an open connection
+ * instead of repeating the TCP and TLS handshakes.
+ *
+ * @return resource|CurlShareHandle The shared handle
+ */
+function curl_shared_handle() {
+    static $share = null;
+
+    if ($share === null) {
+        $share = curl_share_init();
+        curl_share_setopt($share, CURLSHOPT_SHARE, CURL_LOCK_DATA_CONNECT);
+        curl_share_setopt($share, CURLSHOPT_SHARE, CURL_LOCK_DATA_DNS);
+        curl_share_setopt($share, CURLSHOPT_SHARE, CURL_LOCK_DATA_SSL_SESSION);
+    }
+
+    return $share;
+}
+
+/**
+ * Prefer HTTP/2 on a cURL handle, multiplexing onto existing connections.
+ *
+ * Set outside curl_setopt_array(), which stops at the first option libcurl
+ * rejects, and only when libcurl was built with HTTP/2 support.
+ *
+ * @param resource|CurlHandle $ch The cURL handle
+ * @return void
+ */
+function curl_prefer_http2($ch) {
+    static $supported = null;
+
+    if ($supported === null) {
+        $supported = (bool)(curl_version()['features'] & CURL_VERSION_HTTP2);
+    }
+
+    if (!$supported) {
+        return;
+    }
+
+    // Prefer multiplexing onto an existing HTTP/2 connection over opening a new one
+    curl_setopt($ch, CURLOPT_HTTP_VERSION, CURL_HTTP_VERSION_2TLS);
+    curl_setopt($ch, CURLOPT_PIPEWAIT, true);
+}
+
+/**
+ * Execute a cURL request, retrying transient failures with backoff.
+ *
+ * @param callable $make_handle Returns a fresh cURL handle for each attempt
+ * @return array ['body' => string|false, 'http_code' => int]
+ */
+function curl_exec_with_retry($make_handle) {
+    for ($attempt = 0; ; $attempt++) {
+        $ch = $make_handle();
+        $body = curl_exec($ch);
+        $http_code = curl_getinfo($ch, CURLINFO_HTTP_CODE);
+        curl_close($ch);
+
+        if (!in_array($http_code, HTTP_RETRY_STATUS_CODES, true) || $attempt >= HTTP_MAX_RETRIES) {
+            return [
+                'body' => $body,
+                'http_code' => $http_code
+            ];
+        }
+
+        $delay = 0.5 * (2 ** $attempt);
+        echo "Request failed (HTTP {$http_code}), retrying in {$delay} seconds...\n";
+        usleep((int)($delay * 1000000));
+    }
+}
+
+/**
+ * Work out how long to wait before retrying a rate-limited GitHub response.
+ *
+ * Uses Retry-After for secondary rate limits and X-RateLimit-Reset once the
+ * primary rate limit is used up.
+ *
+ * @param array $response Response with 'body', 'headers' and 'http_code'
+ * @return int|null Seconds to wait, or null if the response isn't rate limited
+ */
+function github_rate_limit_delay($response) {
+    if ($response['http_code'] !== 403 && $response['http_code'] !== 429) {
+        return null;
+    }
+
+    $headers = $response['headers'];
+
+    if (isset($headers['retry-after'])) {
+        return max(1, (int)$headers['retry-after']);
+    }
+
+    if (($headers['x-ratelimit-remaining'] ?? null) === '0' && isset($headers['x-ratelimit-reset'])) {
+        return max(1, (int)$headers['x-ratelimit-reset'] - time()) + 1;
+    }
+
+    // Secondary rate limits don't always say when to retry
+    if (stripos((string)$response['body'], 'rate limit') !== false) {
+        return 60;
+    }
+
+    // Any other 403 is a real error, e.g. missing permissions
+    return null;
+}
+
+/**
+ * Execute a GitHub API request, waiting out rate limits.
+ *
+ * @param callable $make_handle Called as $make_handle(&$headers); returns a cURL handle
+ * @return array Response with 'body', 'headers' and 'http_code'
+ */
+function github_exec_with_rate_limit($make_handle) {
+    for ($attempt = 0; ; $attempt++) {
+        $headers = [];
+        $result = curl_exec_with_retry(function() use ($make_handle, &$headers) {
+            $headers = [];
+            return $make_handle($headers);
+        });
+        $result['headers'] = $headers;
+
+        $delay = github_rate_limit_delay($result);
+        if ($delay === null || $attempt >= GITHUB_RATE_LIMIT_RETRIES) {
+            return $result;
+        }
+
+        echo "Rate limit hit, waiting {$delay} seconds...\n";
+        sleep($delay);
+    }
+}
+
 /**
  * Make a request to the GitHub API with authentication and rate limit handling.
  *
  * @param string $url The API URL
  * @param string $token The GitHub token
  * @param bool $return_headers Whether to return headers along with the body
+ * @param array $extra_headers Additional request headers (e.g. "If-None-Match: ...")
  * @return array|string Response body (or array with 'body' and 'headers' if $return_headers is true)
  */
-function github_request($url, $token, $return_headers = false) {
-    $ch = curl_init($url);
+function github_request($url, $token, $return_headers = false, $extra_headers = []) {
+    $result = github_exec_with_rate_limit(function(&$headers) use ($url, $token, $extra_headers) {
+        return github_curl_handle($url, $token, $extra_headers, $headers);
+    });
 
-    $headers = [];
+    if ($return_headers) {
+        return $result;
+    }
+
+    return $result['body'];
+}
+
+/**
+ * Make a query against the GitHub GraphQL API.
+ *
+ * @param string $query The GraphQL query
+ * @param string $token The GitHub token
+ * @return array|null The response's "data" member, or null on failure
+ */
+function github_graphql_request($query, $token) {
+    $payload = json_encode(['query' => $query]);
+
+    $result = github_exec_with_rate_limit(function(&$headers) use ($payload, $token) {
+        $ch = github_curl_handle('https://api.github.com/graphql', $token, ['Content-Type: application/json'], $headers);
+        curl_setopt_array($ch, [
+            CURLOPT_POST => true,
+            CURLOPT_POSTFIELDS => $payload
+        ]);
+        return $ch;
+    });
+
+    if ($result['http_code'] !== 200) {
+        echo "Error running GraphQL query: HTTP {$result['http_code']}\n";
+        return null;
+    }
+
+    $response = json_decode($result['body'], true);
+
+    // Partial results come back alongside errors, e.g. for a missing PR
+    foreach ($response['errors'] ?? [] as $error) {
+        echo "GraphQL error: {$error['message']}\n";
+    }
+
+    return $response['data'] ?? null;
+}
+
+/**
+ * Create a cURL handle for a GitHub API request.
+ *
+ * @param string $url The API URL
+ * @param string $token The GitHub token
+ * @param array $extra_headers Additional request headers
+ * @param array $headers Receives the response headers, keyed by lowercase name
+ * @return resource|CurlHandle The configured cURL handle
+ */
+function github_curl_handle($url, $token, $extra_headers, &$headers) {
+    $ch = curl_init($url);
 
     curl_setopt_array($ch, [
         CURLOPT_RETURNTRANSFER => true,
-        CURLOPT_HTTPHEADER => [
+        CURLOPT_SHARE => curl_shared_handle(),
+        CURLOPT_HTTPHEADER => array_merge([
             "Authorization: Bearer $token",
             "User-Agent: WooDevTools",
             "Accept: application/vnd.github.v3+json"
-        ],
+        ], $extra_headers),
         CURLOPT_HEADERFUNCTION => function($curl, $header) use (&$headers) {
             $len = strlen($header);
             $header = explode(':', $header, 2);
@@ -70,51 +281,158 @@ function github_request($url, $token, $return_headers = false) {
             return $len;
         }
     ]);
+    curl_prefer_http2($ch);
 
-    $response = curl_exec($ch);
-    $http_code = curl_getinfo($ch, CURLINFO_HTTP_CODE);
-    curl_close($ch);
+    return $ch;
+}
 
-    // Handle rate limit
-    if ($http_code === 403) {
-        echo "Rate limit hit, waiting 60 seconds...\n";
-        sleep(60);
-        return github_request($url, $token, $return_headers);
-    }
+/**
+ * Run several cURL requests concurrently.
+ *
+ * Keeps up to $concurrency transfers in flight on a single multi handle,
+ * multiplexed over shared HTTP/2 connections where the server allows it.
+ * Transient failures (HTTP_RETRY_STATUS_CODES) are retried with backoff.
+ * $on_response is called as $on_response($key, $response) as each
+ * request completes.
+ *
+ * @param array $requests Map of key => request description passed to $make_handle
+ * @param callable $make_handle Called as $make_handle($request, &$headers); returns a cURL handle
+ * @param int $concurrency Maximum number of requests in flight
+ * @param callable $on_response Per-response callback
+ * @return void
+ */
+function curl_request_multi($requests, $make_handle, $concurrency, $on_response) {
+    $multi = curl_multi_init();
+    curl_multi_setopt($multi, CURLMOPT_PIPELINING, CURLPIPE_MULTIPLEX);
+    $pending = array_keys($requests);
+
+    for ($attempt = 0; !empty($pending); $attempt++) {
+        $queue = $pending;
+        $pending = [];
+        $active = [];
+        $headers = [];
+
+        do {
+            // Top up the pool of in-flight transfers
+            while (count($active) < $concurrency && !empty($queue)) {
+                $key = array_shift($queue);
+                $headers[$key] = [];
+                $active[$key] = $make_handle($requests[$key], $headers[$key]);
+                curl_multi_add_handle($multi, $active[$key]);
+            }
 
-    if ($return_headers) {
-        return [
-            'body' => $response,
-            'headers' => $headers,
-            'http_code' => $http_code
-        ];
+            curl_multi_exec($multi, $running);
+            if ($running) {
+                curl_multi_select($multi);
+            }
+
+            // Collect finished transfers
+            while ($info = curl_multi_info_read($multi)) {
+                $ch = $info['handle'];
+                $key = array_search($ch, $active, true);
+
+                $response = [
+                    'body' => curl_multi_getcontent($ch),
+                    'headers' => $headers[$key],
+                    'http_code' => curl_getinfo($ch, CURLINFO_HTTP_CODE)
+                ];
+
+                curl_multi_remove_handle($multi, $ch);
+                curl_close($ch);
+                unset($active[$key], $headers[$key]);
+
+                // Transient failures are retried in the next round, as in curl_exec_with_retry()
+                if (in_array($response['http_code'], HTTP_RETRY_STATUS_CODES, true) && $attempt < HTTP_MAX_RETRIES) {
+                    $pending[] = $key;
+                } else {
+                    $on_response($key, $response);
+                }
+            }
+        } while (!empty($active) || !empty($queue));
+
+        if (!empty($pending)) {
+            $delay = 0.5 * (2 ** $attempt);
+            echo count($pending) . " requests failed, retrying in {$delay} seconds...\n";
+            usleep((int)($delay * 1000000));
+        }
     }
 
-    return $response;
+    curl_multi_close($multi);
 }
 
 /**
- * Make a request to the WordPress REST API.
+ * Make several GitHub API requests concurrently.
  *
- * @param string $url The API URL
- * @param array $params Query parameters
- * @param bool $return_headers Whether to return headers along with the body
- * @return array Response with 'body' and optionally 'headers'
+ * Rate-limited requests are retried after waiting, as in github_request().
+ * When $on_response is given it is called as $on_response($key, $response)
+ * as each request completes, and responses are not collected.
+ *
+ * @param array $requests Map of key => ['url' => string, 'headers' => array]
+ * @param string $token The GitHub token
+ * @param int $concurrency Maximum number of requests in flight
+ * @param callable|null $on_response Optional per-response callback
+ * @return array Map of key => ['body' => string, 'headers' => array, 'http_code' => int]
  */
-function wordpress_request($url, $params = [], $return_headers = false) {
-    if (!empty($params)) {
-        $url .= '?' . http_build_query($params);
+function github_request_multi($requests, $token, $concurrency = 16, $on_response = null) {
+    $results = [];
+    $pending = $requests;
+
+    $make_handle = function($request, &$headers) use ($token) {
+        return github_curl_handle($request['url'], $token, $request['headers'] ?? [], $headers);
+    };
+
+    for ($attempt = 0; !empty($pending); $attempt++) {
+        $rate_limited = [];
+        $delay = 0;
+
+        curl_request_multi($pending, $make_handle, $concurrency, function($key, $response) use ($pending, $on_response, $attempt, &$rate_limited, &$delay, &$results) {
+            // Handle rate limit
+            $wait = github_rate_limit_delay($response);
+            if ($wait !== null && $attempt < GITHUB_RATE_LIMIT_RETRIES) {
+                $rate_limited[$key] = $pending[$key];
+                $delay = max($delay, $wait);
+            } elseif ($on_response !== null) {
+                $on_response($key, $response);
+            } else {
+                $results[$key] = $response;
+            }
+        });
+
+        $pending = $rate_limited;
+        if (!empty($pending)) {
+            echo "Rate limit hit, waiting {$delay} seconds...\n";
+            sleep($delay);
+        }
     }
 
-    $ch = curl_init($url);
+    // Return results in request order
+    $ordered = [];
+    foreach (array_keys($requests) as $key) {
+        if (isset($results[$key])) {
+            $ordered[$key] = $results[$key];
+        }
+    }
 
-    $headers = [];
+    return $ordered;
+}
+
+/**
+ * Create a cURL handle for a WordPress REST API request.
+ *
+ * @param string $url The full API URL, including any query string
+ * @param array $extra_headers Additional request headers
+ * @param array $headers Receives the response headers, keyed by lowercase name
+ * @return resource|CurlHandle The configured cURL handle
+ */
+function wordpress_curl_handle($url, $extra_headers, &$headers) {
+    $ch = curl_init($url);
 
     curl_setopt_array($ch, [
         CURLOPT_RETURNTRANSFER => true,
-        CURLOPT_HTTPHEADER => [
+        CURLOPT_SHARE => curl_shared_handle(),
+        CURLOPT_HTTPHEADER => array_merge([
             "User-Agent: WooDevTools"
-        ],
+        ], $extra_headers),
         CURLOPT_HEADERFUNCTION => function($curl, $header) use (&$headers) {
             $len = strlen($header);
             $header = explode(':', $header, 2);
@@ -125,10 +443,33 @@ function wordpress_request($url, $params = [], $return_headers = false) {
             return $len;
         }
     ]);
+    curl_prefer_http2($ch);
+
+    return $ch;
+}
+
+/**
+ * Make a request to the WordPress REST API.
+ *
+ * @param string $url The API URL
+ * @param array $params Query parameters
+ * @param bool $return_headers Whether to return headers along with the body
+ * @param array $extra_headers Additional request headers (e.g. "If-None-Match: ...")
+ * @return array Response with 'body' and optionally 'headers'
+ */
+function wordpress_request($url, $params = [], $return_headers = false, $extra_headers = []) {
+    if (!empty($params)) {
+        $url .= '?' . http_build_query($params);
+    }
+
+    $headers = [];
 
-    $response = curl_exec($ch);
-    $http_code = curl_getinfo($ch, CURLINFO_HTTP_CODE);
-    curl_close($ch);
+    $result = curl_exec_with_retry(function() use ($url, $extra_headers, &$headers) {
+        $headers = [];
+        return wordpress_curl_handle($url, $extra_headers, $headers);
+    });
+    $response = $result['body'];
+    $http_code = $result['http_code'];
 
     if ($return_headers) {
         return [
@@ -141,6 +482,113 @@ function wordpress_request($url, $params = [], $return_headers = false) {
     return $response;
 }
 
+/**
+ * Make several WordPress REST API requests concurrently.
+ *
+ * @param array $requests Map of key => ['url' => string, 'params' => array]
+ * @param int $concurrency Maximum number of requests in flight
+ * @return array Map of key => ['body' => string, 'headers' => array, 'http_code' => int]
+ */
+function wordpress_request_multi($requests, $concurrency = 10) {
+    $results = [];
+
+    $make_handle = function($request, &$headers) {
+        $url = $request['url'];
+        if (!empty($request['params'])) {
+            $url .= '?' . http_build_query($request['params']);
+        }
+        return wordpress_curl_handle($url, [], $headers);
+    };
+
+    curl_request_multi($requests, $make_handle, $concurrency, function($key, $response) use (&$results) {
+        $results[$key] = $response;
+    });
+
+    // Return results in request order
+    $ordered = [];
+    foreach (array_keys($requests) as $key) {
+        $ordered[$key] = $results[$key];
+    }
+
+    return $ordered;
+}
+
+/**
+ * Make a conditional GET request using cached ETag/Last-Modified validators.
+ *
+ * Successful responses are cached under .cache/http/ along with their
+ * validators. When the server answers 304 Not Modified, the cached
+ * response is returned in its place.
+ *
+ * @param string $url The full request URL, used as the cache key
+ * @param callable $send Called as $send($extra_headers); returns an array with 'body', 'headers' and 'http_code'
+ * @return array Response with 'body', 'headers' and 'http_code'
+ */
+function cached_request($url, $send) {
+    $cache_path = CACHE_DIR . '/http/' . sha1($url) . '.json';
+    $cached = read_cache_file($cache_path);
+
+    $extra_headers = [];
+    if (!empty($cached['etag'])) {
+        $extra_headers[] = "If-None-Match: {$cached['etag']}";
+    }
+    if (!empty($cached['last_modified'])) {
+        $extra_headers[] = "If-Modified-Since: {$cached['last_modified']}";
+    }
+
+    $response = $send($extra_headers);
+
+    if ($response['http_code'] === 304 && $cached !== null) {
+        return [
+            'body' => $cached['body'],
+            'headers' => $cached['headers'],
+            'http_code' => 200
+        ];
+    }
+
+    $etag = $response['headers']['etag'] ?? '';
+    $last_modified = $response['headers']['last-modified'] ?? '';
+
+    if ($response['http_code'] === 200 && ($etag !== '' || $last_modified !== '')) {
+        write_cache_file($cache_path, [
+            'etag' => $etag,
+            'last_modified' => $last_modified,
+            'headers' => $response['headers'],
+            'body' => $response['body']
+        ]);
+    }
+
+    return $response;
+}
+
+/**
+ * Make a conditional request to the GitHub API.
+ *
+ * @param string $url The API URL
+ * @param string $token The GitHub token
+ * @return array Response with 'body', 'headers' and 'http_code'
+ */
+function github_request_cached($url, $token) {
+    return cached_request($url, function($extra_headers) use ($url, $token) {
+        return github_request($url, $token, true, $extra_headers);
+    });
+}
+
+/**
+ * Make a conditional request to the WordPress REST API.
+ *
+ * @param string $url The API URL
+ * @param array $params Query parameters
+ * @return array Response with 'body', 'headers' and 'http_code'
+ */
+function wordpress_request_cached($url, $params = []) {
+    $full_url = empty($params) ? $url : $url . '?' . http_build_query($params);
+
+    return cached_request($full_url, function($extra_headers) use ($url, $params) {
+        return wordpress_request($url, $params, true, $extra_headers);
+    });
+}
+
 /**
  * Sanitize a string for use as a filename.
  *
@@ -167,24 +615,31 @@ function extract_changes_section($description) {
         return '';
     }
 
+    // Skip descriptions that don't use the PR template, and only clean up
+    // the text from the changes section onwards
+    $start = strpos($description, 'Changes proposed in this Pull Request:');
+    if ($start === false) {
+        return '';
+    }
+    $description = substr($description, $start);
+
     // Strip HTML tags
     $description = preg_replace('/<[^>]+>/', '', $description);
     // Unescape HTML entities
     $description = html_entity_decode($description, ENT_QUOTES | ENT_HTML5, 'UTF-8');
 
     // Find content between "Changes proposed" and "How to test"
-    $pattern = '/Changes proposed in this Pull Request:(.*?)(?=How to test the changes in this Pull Request:|\Z)/s';
-    if (preg_match($pattern, $description, $matches)) {
-        $content = $matches[1];
-        // Clean up the content
-        $lines = explode("\n", $content);
-        $lines = array_map('trim', $lines);
-        $lines = array_filter($lines, function($line) {
-            return !empty($line) &&
-                   strpos($line, '<!--') !== 0 &&
-                   substr($line, -3) !== '-->';
-        });
-        return trim(implode("\n", $lines));
+    if (preg_match(CHANGES_SECTION_PATTERN, $description, $matches)) {
+        // Clean up the content in one pass, dropping blank lines and HTML comments
+        $content = '';
+        for ($line = strtok($matches[1], "\n"); $line !== false; $line = strtok("\n")) {
+            $line = trim($line);
+            if (empty($line) || strpos($line, '<!--') === 0 || substr($line, -3) === '-->') {
+                continue;
+            }
+            $content .= $line . "\n";
+        }
+        return trim($content);
     }
 
     return '';
@@ -197,17 +652,12 @@ function extract_changes_section($description) {
  * @return string The plain text content
  */
 function html_to_text($html) {
-    // Convert headers to text with newlines
-    $text = preg_replace('/<h[1-6][^>]*>(.*?)<\/h[1-6]>/is', "\n## $1\n\n", $html);
-    // Convert paragraphs to double newlines
-    $text = preg_replace('/<\/p>/i', "\n\n", $text);
-    // Convert line breaks to newlines
-    $text = preg_replace('/<br\s*\/?>/i', "\n", $text);
-    // Convert list items
-    $text = preg_replace('/<li[^>]*>/i', "* ", $text);
-    $text = preg_replace('/<\/li>/i', "\n", $text);
-    // Convert links to markdown-style
-    $text = preg_replace('/<a[^>]+href=["\']([^"\']+)["\'][^>]*>(.*?)<\/a>/is', '[$2]($1)', $text);
+    // Convert headers, paragraphs, line breaks, list items and links
+    $text = preg_replace(
+        array_keys(HTML_TO_TEXT_REPLACEMENTS),
+        array_values(HTML_TO_TEXT_REPLACEMENTS),
+        $html
+    );
     // Strip remaining tags
     $text = strip_tags($text);
     // Decode HTML entities
@@ -227,6 +677,28 @@ function html_to_text($html) {
  * @return bool True on success, false on failure
  */
 function write_csv_with_bom($filename, $headers, $rows) {
+    $handle = open_csv_with_bom($filename, $headers);
+    if (!$handle) {
+        return false;
+    }
+
+    // Write rows
+    foreach ($rows as $row) {
+        write_csv_row($handle, $headers, $row);
+    }
+
+    fclose($handle);
+    return true;
+}
+
+/**
+ * Open a CSV file for writing and write the UTF-8 BOM and header row.
+ *
+ * @param string $filename The output filename
+ * @param array $headers The column headers
+ * @return resource|false The file handle, or false on failure
+ */
+function open_csv_with_bom($filename, $headers) {
     $handle = fopen($filename, 'w');
     if (!$handle) {
         return false;
@@ -238,18 +710,24 @@ function write_csv_with_bom($filename, $headers, $rows) {
     // Write headers
     fputcsv($handle, $headers, ',', '"', '\\');
 
-    // Write rows
-    foreach ($rows as $row) {
-        // Ensure row is in correct order matching headers
-        $ordered_row = [];
-        foreach ($headers as $header) {
-            $ordered_row[] = $row[$header] ?? '';
-        }
-        fputcsv($handle, $ordered_row, ',', '"', '\\');
-    }
+    return $handle;
+}
 
-    fclose($handle);
-    return true;
+/**
+ * Write a single row to an open CSV file.
+ *
+ * @param resource $handle The file handle
+ * @param array $headers The column headers
+ * @param array $row The row data (associative array)
+ * @return void
+ */
+function write_csv_row($handle, $headers, $row) {
+    // Ensure row is in correct order matching headers
+    $ordered_row = [];
+    foreach ($headers as $header) {
+        $ordered_row[] = $row[$header] ?? '';
+    }
+    fputcsv($handle, $ordered_row, ',', '"', '\\');
 }
 
 /**
@@ -287,3 +765,39 @@ function parse_next_page_url($link_header) {
 
     return null;
 }
+
+/**
+ * Read a JSON cache file.
+ *
+ * @param string $path Path to the cache file
+ * @return array|null The cached data, or null if missing or unreadable
+ */
+function read_cache_file($path) {
+    if (!is_file($path)) {
+        return null;
+    }
+
+    $data = json_decode(file_get_contents($path), true);
+    return is_array($data) ? $data : null;
+}
+
+/**
+ * Write data to a JSON cache file atomically.
+ *
+ * Writes to a temporary file and renames it into place so an interrupted
+ * run never leaves a truncated cache entry behind.
+ *
+ * @param string $path Path to the cache file
+ * @param array $data The data to cache
+ * @return bool True on success, false on failure
+ */
+function write_cache_file($path, $data) {
+    ensure_directory(dirname($path));
+
+    $tmp_path = $path . '.' . getmypid() . '.tmp';
+    if (file_put_contents($tmp_path, json_encode($data)) === false) {
+        return false;
+    }
+
+    return rename($tmp_path, $path);
+}